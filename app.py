@@ -6,6 +6,7 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import requests
 import json
+from comissoes import limpar_regras, calcular_comissoes, aplicar_comissoes, buscar_paginado, escopo_da_venda
 
 # ==============================================================================
 # ⚙️ CONFIGURAÇÕES DA IA (CLOUDFLARE)
@@ -192,8 +193,7 @@ supabase = init_connection()
 def get_data(table, order_col='created_at'):
     if not supabase: return pd.DataFrame()
     try:
-        res = supabase.table(table).select("*").order(order_col, desc=True).execute()
-        df = pd.DataFrame(res.data)
+        df = pd.DataFrame(buscar_paginado(supabase, table, order_col))
         
         # Tratamento de datas
         cols_date = ['created_at', 'data_expiracao']
@@ -225,6 +225,19 @@ def check_status(data_exp):
     if delta <= 3: return f"Vence em {delta} dias", "#F59E0B"
     return "Ativo", "#10B981"
 
+# ==============================================================================
+# 💰 MOTOR DE COMISSÕES
+# ==============================================================================
+def carregar_regras():
+    config = {}
+    df_regras = get_data('regras_comissao')
+    if not df_regras.empty and 'config' in df_regras.columns:
+        config = df_regras.iloc[0]['config']
+        if isinstance(config, str):
+            try: config = json.loads(config)
+            except: config = {}
+    return limpar_regras(config if isinstance(config, dict) else {})
+
 # ==============================================================================
 # 🧠 FUNÇÃO IA (CLOUDFLARE)
 # ==============================================================================
@@ -327,7 +340,7 @@ def admin_panel():
     with st.sidebar:
         st.title("Admin Panel")
         st.markdown("<div style='margin-bottom: 20px; color: #94A3B8; font-size: 0.8rem;'>Controle Geral</div>", unsafe_allow_html=True)
-        nav = st.radio("Navegação", ["Dashboard", "Gerenciar Parceiros", "Base de Clientes", "Financeiro"], label_visibility="collapsed")
+        nav = st.radio("Navegação", ["Dashboard", "Gerenciar Parceiros", "Base de Clientes", "Regras de Comissão", "Financeiro"], label_visibility="collapsed")
         st.markdown("---")
         if st.button("Sair do Sistema"):
             st.session_state.clear()
@@ -483,9 +496,14 @@ def admin_panel():
                 if st.form_submit_button("Registrar Cliente", use_container_width=True):
                     cupom_final = None
                     comissao = 0.0
+                    # Mesmo fuso de get_data (created_at - 3h) para cair no mesmo mês das vendas gravadas
+                    criado = datetime.now() - timedelta(hours=3)
                     if "Sem Afiliado" not in afiliado_sel:
                         cupom_final = afiliado_sel.split("(")[-1].replace(")", "")
-                        comissao = 15.0 
+                        regras = carregar_regras()
+                        novo = pd.DataFrame([{"nome_cliente": nome, "valor_plano": valor, "cupom": cupom_final, "created_at": criado}])
+                        base = pd.concat([df_vendas, novo], ignore_index=True) if not df_vendas.empty else novo
+                        comissao = float(calcular_comissoes(base, regras).iloc[-1])
                     
                     data_exp = datetime.now() + timedelta(days=30)
                     supabase.table("vendas").insert({
@@ -496,6 +514,10 @@ def admin_panel():
                         "data_expiracao": data_exp.strftime('%Y-%m-%d'),
                         "status": "Ativo"
                     }).execute()
+
+                    if cupom_final:
+                        # Venda gravada pode subir o parceiro de faixa: só ele e só no mês atual
+                        aplicar_comissoes(supabase, base, regras, escopo=escopo_da_venda(base, cupom_final, criado))
                     st.success("Cliente adicionado!")
                     time.sleep(1)
                     st.rerun()
@@ -529,12 +551,92 @@ def admin_panel():
                 
                 if c[5].button("🗑️", key=f"del_cli_{row['id']}"):
                     supabase.table("vendas").delete().eq("id", row['id']).execute()
+                    if row['cupom'] and pd.notnull(row.get('created_at')):
+                        # Sem a venda o parceiro pode cair de faixa e a próxima venda do cliente deixa de ser renovação
+                        restante = df_vendas[df_vendas['id'] != row['id']]
+                        escopo = escopo_da_venda(restante, row['cupom'], row['created_at'], row['nome_cliente'])
+                        aplicar_comissoes(supabase, restante, carregar_regras(), escopo=escopo)
                     st.rerun()
                 st.markdown("<hr style='margin: 5px 0; border-color: rgba(128,128,128,0.1);'>", unsafe_allow_html=True)
         else: st.info("Sem clientes.")
         st.markdown('</div>', unsafe_allow_html=True)
 
-    # --- 4. FINANCEIRO ---
+    # --- 4. REGRAS DE COMISSÃO ---
+    elif nav == "Regras de Comissão":
+        st.title("Regras de Comissão")
+        regras = carregar_regras()
+        c1, c2 = st.columns([2, 1])
+
+        with c1:
+            st.markdown('<div class="card-box">', unsafe_allow_html=True)
+            st.markdown("### ⚙️ Configuração")
+            b1, b2, b3 = st.columns(3)
+            percentual = b1.number_input("Percentual Base (%)", min_value=0.0, value=float(regras['percentual']), step=1.0)
+            valor_fixo = b2.number_input("Valor Fixo por Venda (R$)", min_value=0.0, value=float(regras['valor_fixo']), step=1.0)
+            fator_renov = b3.number_input("Renovação (% da comissão)", min_value=0.0, value=float(regras['fator_renovacao']) * 100, step=10.0)
+
+            st.markdown("##### 📈 Faixas por Volume Mensal")
+            faixas = st.data_editor(
+                pd.DataFrame(regras['faixas'], columns=['min_vendas', 'percentual', 'valor_fixo']),
+                num_rows="dynamic", hide_index=True, use_container_width=True, key="ed_faixas"
+            )
+            st.markdown("##### 🏷️ Percentual por Plano")
+            planos = st.data_editor(
+                pd.DataFrame(regras['planos'], columns=['valor_plano', 'percentual']),
+                num_rows="dynamic", hide_index=True, use_container_width=True, key="ed_planos"
+            )
+
+            novas_regras = limpar_regras({
+                "percentual": percentual,
+                "valor_fixo": valor_fixo,
+                "faixas": faixas.to_dict('records'),
+                "planos": planos.to_dict('records'),
+                "fator_renovacao": fator_renov / 100,
+            })
+
+            st.markdown("##### 🗓️ Alcance do Recálculo")
+            mes_atual = pd.Period(datetime.now() - timedelta(hours=3), 'M')
+            meses_vendas = df_vendas['created_at'].dt.to_period('M').dropna() if not df_vendas.empty else pd.Series(dtype=object)
+            meses = sorted({mes_atual, *meses_vendas}, reverse=True)
+            r1, r2 = st.columns(2)
+            mes_inicio = r1.selectbox("Recalcular a partir de", meses, index=meses.index(mes_atual), format_func=lambda m: m.strftime('%m/%Y'))
+            todo_historico = r2.checkbox("Recalcular todo o histórico (inclui meses com saques já pagos)")
+            if todo_historico:
+                escopo = None
+                st.warning("Comissões de meses já pagos serão reescritas e saldos podem ficar negativos.")
+            else:
+                escopo = df_vendas['created_at'].dt.to_period('M') >= mes_inicio if not df_vendas.empty else None
+
+            if st.button("💾 Salvar e Recalcular Comissões", use_container_width=True):
+                texto = "Recalculando todo o histórico..." if todo_historico else f"Recalculando vendas desde {mes_inicio.strftime('%m/%Y')}..."
+                with st.spinner(texto):
+                    inicio = time.time()
+                    try:
+                        supabase.table("regras_comissao").insert({"config": novas_regras}).execute()
+                    except Exception as e:
+                        # Sem regras salvas não recalcula: o próximo cadastro voltaria às regras antigas
+                        st.error(f"Erro ao salvar as regras (tabela regras_comissao): {e}. Nenhuma comissão foi alterada.")
+                        return
+                    alteradas = aplicar_comissoes(supabase, df_vendas, novas_regras, escopo=escopo)
+                    st.success(f"{alteradas} vendas atualizadas em {time.time() - inicio:.1f}s.")
+                    time.sleep(1)
+                    st.rerun()
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with c2:
+            st.markdown('<div class="card-box">', unsafe_allow_html=True)
+            st.subheader("Prévia")
+            if not df_vendas.empty:
+                atual = df_vendas['valor_comissao'].sum()
+                novas = calcular_comissoes(df_vendas, novas_regras)
+                previa = (novas if escopo is None else df_vendas['valor_comissao'].where(~escopo, novas)).sum()
+                card_metric("Comissões Atuais", f"R$ {atual:,.2f}")
+                st.markdown("<br>", unsafe_allow_html=True)
+                card_metric("Com Novas Regras", f"R$ {previa:,.2f}", "metric-highlight")
+            else: st.info("Sem vendas para simular.")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+    # --- 5. FINANCEIRO ---
     elif nav == "Financeiro":
         st.title("Financeiro & Pagamentos")
         c1, c2 = st.columns([2, 1])
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# 💰 MOTOR DE COMISSÕES (sem Streamlit, importável nos testes)
+# ==============================================================================
+REGRAS_COMISSAO_PADRAO = {
+    "percentual": 0.0,       # % sobre o valor do plano
+    "valor_fixo": 15.0,      # R$ fixo por venda com cupom
+    "faixas": [],            # [{"min_vendas": 10, "percentual": 5.0, "valor_fixo": 15.0}] -> volume mensal do parceiro
+    "planos": [],            # [{"valor_plano": 35.0, "percentual": 20.0}] -> sobrescreve o percentual do plano
+    "fator_renovacao": 1.0,  # 1.0 = comissão recorrente integral, 0 = sem comissão na renovação
+}
+
+def limpar_regras(regras):
+    # Normaliza as regras vindas do editor: só números, faixas sem lacunas e nada de NaN no JSON
+    limpas = {**REGRAS_COMISSAO_PADRAO, **{k: v for k, v in (regras or {}).items() if k in REGRAS_COMISSAO_PADRAO}}
+    for chave in ('percentual', 'valor_fixo', 'fator_renovacao'):
+        numero = pd.to_numeric(pd.Series([limpas[chave]]), errors='coerce').iloc[0]
+        limpas[chave] = float(REGRAS_COMISSAO_PADRAO[chave] if pd.isna(numero) else numero)
+
+    # Faixa sem percentual/valor fixo herda o valor base
+    faixas = pd.DataFrame(limpas['faixas'] or [], columns=['min_vendas', 'percentual', 'valor_fixo'])
+    faixas = faixas.apply(pd.to_numeric, errors='coerce').dropna(subset=['min_vendas'])
+    faixas = faixas.fillna({'percentual': limpas['percentual'], 'valor_fixo': limpas['valor_fixo']}).astype(float)
+    limpas['faixas'] = faixas.to_dict('records')
+
+    # Plano sem valor ou sem percentual não tem como ser aplicado
+    planos = pd.DataFrame(limpas['planos'] or [], columns=['valor_plano', 'percentual'])
+    limpas['planos'] = planos.apply(pd.to_numeric, errors='coerce').dropna().astype(float).to_dict('records')
+    return limpas
+
+def calcular_comissoes(df_vendas, regras):
+    # Cálculo vetorizado: todas as vendas de uma vez, sem iterrows
+    if df_vendas.empty: return pd.Series(dtype=float)
+    idx = df_vendas.index
+    vazio = pd.Series(None, index=idx, dtype=object)
+
+    cupom = df_vendas['cupom'] if 'cupom' in df_vendas.columns else vazio
+    com_cupom = cupom.notna() & (cupom.astype(str).str.strip() != '')
+    valor = pd.to_numeric(df_vendas['valor_plano'], errors='coerce').fillna(0.0)
+    criado = pd.to_datetime(df_vendas['created_at'] if 'created_at' in df_vendas.columns else vazio, errors='coerce')
+
+    # Volume mensal de cada parceiro (define a faixa)
+    chave_mes = cupom.astype(str) + '|' + criado.dt.to_period('M').astype(str)
+    volume = chave_mes.map(chave_mes[com_cupom].value_counts()).fillna(0).to_numpy()
+
+    regras = limpar_regras(regras)
+    base = {'min_vendas': 0.0, 'percentual': regras['percentual'], 'valor_fixo': regras['valor_fixo']}
+    faixas = pd.DataFrame([base] + regras['faixas'], columns=['min_vendas', 'percentual', 'valor_fixo'])
+    faixas = faixas.sort_values('min_vendas', kind='stable')
+    pos = np.searchsorted(faixas['min_vendas'].to_numpy(), volume, side='right') - 1
+    pos = np.clip(pos, 0, None)
+    percentual = pd.Series(faixas['percentual'].to_numpy()[pos], index=idx)
+    valor_fixo = pd.Series(faixas['valor_fixo'].to_numpy()[pos], index=idx)
+
+    # Taxa específica por plano sobrescreve o percentual da faixa
+    planos = pd.DataFrame(regras['planos'], columns=['valor_plano', 'percentual'])
+    if not planos.empty:
+        mapa = pd.Series(planos['percentual'].to_numpy(), index=planos['valor_plano'].round(2).to_numpy())
+        mapa = mapa[~mapa.index.duplicated(keep='last')]
+        percentual = valor.round(2).map(mapa).fillna(percentual)
+
+    # Renovação: coluna explícita ou o mesmo cliente voltando pelo mesmo cupom
+    if 'renovacao' in df_vendas.columns:
+        renovacao = df_vendas['renovacao'].fillna(False).astype(bool)
+    else:
+        nomes = df_vendas['nome_cliente'] if 'nome_cliente' in df_vendas.columns else vazio
+        cliente = nomes.fillna('').astype(str).str.strip().str.lower()
+        chave_cliente = (cupom.astype(str) + '|' + cliente)[criado.sort_values(kind='stable').index]
+        # Sem nome não há como reconhecer o cliente: nunca conta como renovação
+        renovacao = chave_cliente.duplicated().reindex(idx) & cliente.ne('')
+    fator = np.where(renovacao, regras['fator_renovacao'], 1.0)
+
+    comissao = (valor * percentual / 100 + valor_fixo) * fator
+    return comissao.where(com_cupom, 0.0).round(2)
+
+def escopo_da_venda(df_vendas, cupom, criado, nome_cliente=None):
+    # Vendas que uma venda nova/excluída pode afetar: faixa do parceiro no mês e renovações seguintes do cliente
+    criado = pd.Timestamp(criado)
+    do_cupom = df_vendas['cupom'] == cupom
+    mesmo_mes = df_vendas['created_at'].dt.to_period('M') == criado.to_period('M')
+    nome = str(nome_cliente or '').strip().lower()
+    if not nome: return do_cupom & mesmo_mes
+    mesmo_cliente = df_vendas['nome_cliente'].fillna('').astype(str).str.strip().str.lower() == nome
+    return do_cupom & (mesmo_mes | (mesmo_cliente & (df_vendas['created_at'] >= criado)))
+
+def aplicar_comissoes(supabase, df_vendas, regras, escopo=None, lote=500):
+    # Grava em massa: um UPDATE por valor de comissão distinto, só nas vendas que mudaram.
+    # O cálculo usa o histórico inteiro (faixas e renovações), mas só grava as vendas em `escopo`.
+    if df_vendas.empty or not supabase or 'id' not in df_vendas.columns: return 0
+    novas = calcular_comissoes(df_vendas, regras)
+    atuais = pd.to_numeric(df_vendas.get('valor_comissao', pd.Series(0.0, index=df_vendas.index)), errors='coerce').fillna(0.0).round(2)
+    mudou = novas.ne(atuais) & df_vendas['id'].notna()
+    if escopo is not None: mudou &= escopo.fillna(False).astype(bool)
+    alteradas = novas[mudou]
+    if alteradas.empty: return 0
+    ids = df_vendas.loc[alteradas.index, 'id']
+    # Venda recém-concatenada sem id transforma a coluna em float (1.0); o banco espera inteiro
+    if pd.api.types.is_float_dtype(ids): ids = ids.astype('int64')
+    ids_por_valor = ids.groupby(alteradas).apply(lambda s: s.tolist())
+    for valor, ids in ids_por_valor.items():
+        for i in range(0, len(ids), lote):
+            supabase.table("vendas").update({"valor_comissao": float(valor)}).in_("id", ids[i:i + lote]).execute()
+    return len(alteradas)
+
+def buscar_paginado(supabase, tabela, order_col='created_at', pagina=1000):
+    # PostgREST corta um select sem paginação no max-rows (1000 no Supabase): busca em páginas via range
+    linhas, inicio = [], 0
+    while True:
+        res = supabase.table(tabela).select("*").order(order_col, desc=True).order("id").range(inicio, inicio + pagina - 1).execute()
+        # Avança pelo que veio de fato: o servidor pode ter max-rows menor que a página
+        if not res.data: return linhas
+        linhas.extend(res.data)
+        inicio += len(res.data)
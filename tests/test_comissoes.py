@@ -0,0 +1,216 @@
+import json
+
+import pandas as pd
+import pytest
+
+from comissoes import (
+    REGRAS_COMISSAO_PADRAO, aplicar_comissoes, buscar_paginado, calcular_comissoes, escopo_da_venda, limpar_regras,
+)
+
+
+class FakeSupabase:
+    # Registra os UPDATEs em vez de falar com o banco; selects respeitam o max-rows do PostgREST
+    def __init__(self, linhas=(), max_rows=1000):
+        self.linhas = list(linhas)
+        self.max_rows = max_rows
+        self.updates = []
+        self.data = []
+
+    def select(self, colunas):
+        self.data = self.linhas[:self.max_rows]
+        return self
+
+    def order(self, coluna, desc=False):
+        return self
+
+    def range(self, inicio, fim):
+        self.data = self.linhas[inicio:min(fim + 1, inicio + self.max_rows)]
+        return self
+
+    def table(self, nome):
+        self.nome = nome
+        return self
+
+    def update(self, dados):
+        self.dados = dados
+        return self
+
+    def in_(self, coluna, valores):
+        self.updates.append((self.nome, self.dados, coluna, list(valores)))
+        return self
+
+    def execute(self):
+        return self
+
+
+def vendas(linhas):
+    df = pd.DataFrame(linhas, columns=['id', 'nome_cliente', 'valor_plano', 'cupom', 'created_at', 'valor_comissao'])
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df
+
+
+def regras(**kwargs):
+    return {**REGRAS_COMISSAO_PADRAO, **kwargs}
+
+
+def test_regras_padrao_mantem_15_reais_por_venda_com_cupom():
+    df = vendas([
+        (1, 'Ana', 35.0, 'X', '2026-01-01', 0.0),
+        (2, 'Bia', 50.0, 'X', '2026-01-02', 0.0),
+        (3, 'Caio', 35.0, None, '2026-01-03', 0.0),
+        (4, 'Davi', 35.0, '', '2026-01-04', 0.0),
+    ])
+    assert calcular_comissoes(df, REGRAS_COMISSAO_PADRAO).tolist() == [15.0, 15.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize('qtd, esperado', [(1, 3.5), (2, 7.0), (3, 7.0), (4, 10.5)])
+def test_faixas_por_volume_mensal(qtd, esperado):
+    df = vendas([(i, f'C{i}', 35.0, 'X', '2026-01-01', 0.0) for i in range(qtd)])
+    r = regras(percentual=10, valor_fixo=0, faixas=[
+        {'min_vendas': 2, 'percentual': 20, 'valor_fixo': 0},
+        {'min_vendas': 4, 'percentual': 30, 'valor_fixo': 0},
+    ])
+    assert calcular_comissoes(df, r).tolist() == [esperado] * qtd
+
+
+def test_faixa_conta_volume_por_parceiro_e_por_mes():
+    df = vendas([
+        (1, 'Ana', 100.0, 'X', '2026-01-01', 0.0),
+        (2, 'Bia', 100.0, 'X', '2026-01-20', 0.0),
+        (3, 'Caio', 100.0, 'X', '2026-02-01', 0.0),
+        (4, 'Davi', 100.0, 'Y', '2026-01-05', 0.0),
+    ])
+    r = regras(percentual=10, valor_fixo=0, faixas=[{'min_vendas': 2, 'percentual': 20, 'valor_fixo': 0}])
+    assert calcular_comissoes(df, r).tolist() == [20.0, 20.0, 10.0, 10.0]
+
+
+def test_percentual_do_plano_sobrescreve_a_faixa():
+    df = vendas([
+        (1, 'Ana', 35.0, 'X', '2026-01-01', 0.0),
+        (2, 'Bia', 50.0, 'X', '2026-01-02', 0.0),
+    ])
+    r = regras(percentual=10, valor_fixo=1, planos=[{'valor_plano': 50, 'percentual': 30}])
+    assert calcular_comissoes(df, r).tolist() == [4.5, 16.0]
+
+
+def test_fator_de_renovacao_para_mesmo_cliente_no_mesmo_cupom():
+    df = vendas([
+        (1, 'Ana', 35.0, 'X', '2026-01-01', 0.0),
+        (2, ' ana ', 35.0, 'X', '2026-02-01', 0.0),
+        (3, 'Ana', 35.0, 'Y', '2026-02-01', 0.0),
+    ])
+    r = regras(fator_renovacao=0.5)
+    assert calcular_comissoes(df, r).tolist() == [15.0, 7.5, 15.0]
+
+
+def test_coluna_renovacao_explicita_tem_prioridade():
+    df = vendas([
+        (1, 'Ana', 35.0, 'X', '2026-01-01', 0.0),
+        (2, 'Ana', 35.0, 'X', '2026-02-01', 0.0),
+    ])
+    df['renovacao'] = [True, False]
+    assert calcular_comissoes(df, regras(fator_renovacao=0)).tolist() == [0.0, 15.0]
+
+
+def test_aplicar_atualiza_apenas_vendas_alteradas_agrupadas_por_valor():
+    df = vendas([
+        (1, 'Ana', 35.0, 'X', '2026-01-01', 15.0),
+        (2, 'Bia', 50.0, 'X', '2026-01-02', 15.0),
+        (3, 'Caio', 50.0, 'X', '2026-01-03', 0.0),
+        (4, 'Davi', 35.0, None, '2026-01-04', 0.0),
+    ])
+    fake = FakeSupabase()
+    r = regras(planos=[{'valor_plano': 50, 'percentual': 10}])
+    assert aplicar_comissoes(fake, df, r) == 2
+    assert fake.updates == [('vendas', {'valor_comissao': 20.0}, 'id', [2, 3])]
+
+
+def test_aplicar_em_lotes_e_ignora_vendas_sem_id():
+    df = vendas([(i, f'C{i}', 35.0, 'X', '2026-01-01', 0.0) for i in range(5)])
+    df.loc[4, 'id'] = None
+    fake = FakeSupabase()
+    assert aplicar_comissoes(fake, df, REGRAS_COMISSAO_PADRAO, lote=2) == 4
+    assert [u[3] for u in fake.updates] == [[0, 1], [2, 3]]
+    assert all(type(i) is int for u in fake.updates for i in u[3])
+
+
+def test_limpar_regras_preenche_faixas_e_descarta_linhas_incompletas():
+    r = limpar_regras(regras(
+        percentual=10, valor_fixo=5,
+        faixas=[
+            {'min_vendas': 3, 'percentual': float('nan'), 'valor_fixo': None},
+            {'min_vendas': None, 'percentual': 50, 'valor_fixo': 0},
+        ],
+        planos=[
+            {'valor_plano': 50, 'percentual': float('nan')},
+            {'valor_plano': 99, 'percentual': 20},
+        ],
+    ))
+    assert r['faixas'] == [{'min_vendas': 3.0, 'percentual': 10.0, 'valor_fixo': 5.0}]
+    assert r['planos'] == [{'valor_plano': 99.0, 'percentual': 20.0}]
+    json.dumps(r, allow_nan=False)
+
+
+def test_aplicar_com_escopo_so_grava_parceiro_e_mes_da_nova_venda():
+    df = vendas([
+        (1, 'Ana', 100.0, 'X', '2025-12-10', 10.0),
+        (2, 'Bia', 100.0, 'X', '2025-12-11', 10.0),
+        (3, 'Caio', 100.0, 'X', '2026-01-05', 10.0),
+        (4, 'Davi', 100.0, 'Y', '2026-01-06', 10.0),
+        (5, 'Eva', 100.0, 'Y', '2026-01-07', 10.0),
+        (None, 'Fábio', 100.0, 'X', '2026-01-08', None),
+    ])
+    r = regras(percentual=10, valor_fixo=0, faixas=[{'min_vendas': 2, 'percentual': 20, 'valor_fixo': 0}])
+    escopo = (df['cupom'] == 'X') & (df['created_at'].dt.to_period('M') == pd.Period('2026-01', 'M'))
+    fake = FakeSupabase()
+    assert aplicar_comissoes(fake, df, r, escopo=escopo) == 1
+    assert fake.updates == [('vendas', {'valor_comissao': 20.0}, 'id', [3])]
+
+
+def test_clientes_sem_nome_nao_contam_como_renovacao():
+    df = vendas([
+        (1, '', 35.0, 'X', '2026-01-01', 0.0),
+        (2, '  ', 35.0, 'X', '2026-01-02', 0.0),
+        (3, None, 35.0, 'X', '2026-01-03', 0.0),
+        (4, None, 35.0, 'X', '2026-01-04', 0.0),
+    ])
+    assert calcular_comissoes(df, regras(fator_renovacao=0)).tolist() == [15.0] * 4
+
+
+def test_recalculo_cobre_a_tabela_inteira_alem_do_max_rows():
+    linhas = [
+        {'id': i, 'nome_cliente': f'C{i}', 'valor_plano': 35.0, 'cupom': 'X',
+         'created_at': f'2026-01-{i % 28 + 1:02d}', 'valor_comissao': 15.0}
+        for i in range(2500)
+    ]
+    fake = FakeSupabase(linhas)
+    df = pd.DataFrame(buscar_paginado(fake, 'vendas'))
+    assert len(df) == 2500
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    assert aplicar_comissoes(fake, df, regras(valor_fixo=20.0), lote=10000) == 2500
+    assert sorted(fake.updates[0][3]) == list(range(2500))
+
+
+def test_paginacao_respeita_max_rows_menor_que_a_pagina():
+    fake = FakeSupabase([{'id': i} for i in range(750)], max_rows=300)
+    assert [l['id'] for l in buscar_paginado(fake, 'vendas')] == list(range(750))
+
+
+def test_excluir_venda_rebaixa_faixa_do_mes_e_desfaz_renovacao():
+    df = vendas([
+        (1, 'Ana', 100.0, 'X', '2025-12-01', 20.0),
+        (2, 'Bia', 100.0, 'X', '2026-01-05', 20.0),
+        (3, 'Caio', 100.0, 'X', '2026-01-06', 20.0),
+        (4, 'Bia', 100.0, 'X', '2026-02-01', 5.0),
+        (5, 'Davi', 100.0, 'X', '2026-02-02', 10.0),
+        (6, 'Eva', 100.0, 'Y', '2026-01-07', 10.0),
+    ])
+    r = regras(percentual=10, valor_fixo=0, fator_renovacao=0.5,
+               faixas=[{'min_vendas': 2, 'percentual': 20, 'valor_fixo': 0}])
+    excluida = df.loc[df['id'] == 2].iloc[0]
+    restante = df[df['id'] != 2]
+    escopo = escopo_da_venda(restante, excluida['cupom'], excluida['created_at'], excluida['nome_cliente'])
+    assert restante.loc[escopo, 'id'].tolist() == [3, 4]
+    fake = FakeSupabase()
+    assert aplicar_comissoes(fake, restante, r, escopo=escopo) == 2
+    assert sorted((u[1]['valor_comissao'], u[3]) for u in fake.updates) == [(10.0, [3]), (20.0, [4])]